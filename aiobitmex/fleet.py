@@ -0,0 +1,80 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+from aiobitmex.http import BitmexHTTP
+from aiobitmex.ratelimit import RateLimiter
+
+
+class BitmexFleet:
+    """Runs operations across many BitMEX accounts concurrently.
+
+    Accounts are given as {name: (api_key, api_secret)}. All of them share one
+    connection pool, every API key gets its own rate limiter.
+    """
+
+    def __init__(
+            self,
+            base_url: str,
+            accounts: Dict[str, Tuple[str, str]],
+            symbol: Optional[str] = None,
+            prefix='aiobitmex',
+            timeout=5,
+            max_concurrency: int = 50,
+            requests_per_minute: int = 120
+    ) -> None:
+
+        if max_concurrency < 1:
+            raise ValueError('Max concurrency must be a positive integer.')
+
+        self.session = aiohttp.ClientSession()
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.accounts = {}
+        for name, (api_key, api_secret) in accounts.items():
+            self.accounts[name] = BitmexHTTP(
+                base_url=base_url,
+                symbol=symbol,
+                api_key=api_key,
+                api_secret=api_secret,
+                prefix=prefix,
+                timeout=timeout,
+                session=self.session,
+                rate_limiter=RateLimiter(requests_per_minute)
+            )
+
+    async def exit(self) -> None:
+        await self.session.close()
+
+    async def run(
+            self,
+            operation: Callable[[BitmexHTTP], Awaitable],
+            accounts: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """Run operation for every account, returns a result or a raised exception by account name."""
+
+        if accounts is None:
+            accounts = list(self.accounts)
+
+        async def run_for(name: str) -> Any:
+            async with self.semaphore:
+                return await operation(self.accounts[name])
+
+        results = await asyncio.gather(*[run_for(name) for name in accounts], return_exceptions=True)
+        return dict(zip(accounts, results))
+
+    async def cancel_all_orders(self, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self.run(lambda conn: conn.cancel_all_orders(), accounts)
+
+    async def cancel_all_after(self, timeout: int, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self.run(lambda conn: conn.cancel_all_after(timeout), accounts)
+
+    async def close_position(self, symbol: str = None, accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self.run(lambda conn: conn.close_position(symbol), accounts)
+
+    async def get_wallet(self, currency: str = 'XBt', accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self.run(lambda conn: conn.get_wallet(currency), accounts)
+
+    async def get_margin(self, currency: str = 'XBt', accounts: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await self.run(lambda conn: conn.get_margin(currency), accounts)
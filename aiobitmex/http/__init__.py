@@ -1,14 +1,29 @@
 import asyncio
 import datetime
+import functools
 import json
 import time
+from collections import deque
 from decimal import Decimal
-from typing import List, Union, Optional
+from typing import Awaitable, Callable, Dict, List, Tuple, Union, Optional
 
 import aiohttp
 
 from aiobitmex import constants
 from aiobitmex.auth import generate_auth_headers
+from aiobitmex.clordid import ClOrdIDGenerator
+from aiobitmex.latency import OrderLatencyTracker
+from aiobitmex.ratelimit import RateLimiter
+from aiobitmex.stats import RollingWindow
+
+# Errors after which a request may or may not have reached the exchange
+NETWORK_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+# Seconds to wait before looking up an order after a failed submission, doubled on every attempt
+LOOKUP_BACKOFF = 0.5
+
+# Latency samples needed before hedging of an endpoint starts
+HEDGE_MIN_SAMPLES = 20
 
 
 class BitmexHTTP:
@@ -21,7 +36,13 @@ class BitmexHTTP:
             api_key: Optional[str] = None,
             api_secret: Optional[str] = None,
             prefix='aiobitmex',
-            timeout=5
+            timeout=5,
+            hedge_requests: bool = False,
+            hedge_quantile: float = 0.95,
+            hedge_budget: float = 0.05,
+            session: Optional[aiohttp.ClientSession] = None,
+            rate_limiter: Optional[RateLimiter] = None,
+            order_tracker: Optional[OrderLatencyTracker] = None
     ) -> None:
 
         self.base_url = base_url
@@ -36,19 +57,41 @@ class BitmexHTTP:
         if len(prefix) > 13:
             raise ValueError('Order id prefix must be at most 13 characters long!')
         self.order_id_prefix = prefix
+        self.generate_clordid = ClOrdIDGenerator(prefix)
+        # Order submissions waiting for the exchange, by clOrdID
+        self.inflight_orders: Dict[str, asyncio.Future] = {}
 
         self.retries = 0  # initialize counter
         self.timeout = timeout
 
-        # Prepare HTTPS session
-        self.session = aiohttp.ClientSession()
+        # Hedging of GET requests: a duplicate is sent if a response is slower than
+        # the hedge_quantile of recent latencies, at most hedge_budget of the rate limit is spent on it
+        if not 0 < hedge_quantile < 1:
+            raise ValueError('Hedge quantile must be between 0 and 1.')
+        if not 0 <= hedge_budget <= 1:
+            raise ValueError('Hedge budget must be between 0 and 1.')
+        self.hedge_requests = hedge_requests
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.hedge_times = deque()
+        self.ratelimit_limit = 120  # requests per minute, updated from response headers
+        self.latencies: Dict[str, RollingWindow] = {}
+
+        self.rate_limiter = rate_limiter
+        # Stamps order requests, websocket events have to be passed to it by the caller
+        self.order_tracker = order_tracker
+
+        # Prepare HTTPS session, a given one is shared with other connectors and is not closed on exit
+        self.own_session = session is None
+        self.session = aiohttp.ClientSession() if session is None else session
         # These headers are always sent
         self.session.headers.update({'user-agent': 'aiobitmex-' + constants.VERSION})
         self.session.headers.update({'content-type': 'application/json'})
         self.session.headers.update({'accept': 'application/json'})
 
     async def exit(self) -> None:
-        await self.session.close()
+        if self.own_session:
+            await self.session.close()
 
     # START ENDPOINTS #
 
@@ -242,7 +285,11 @@ class BitmexHTTP:
             peg_offset_value: Optional[Decimal] = None,
             text: Optional[str] = None
     ) -> dict:
-        """Implements PUT /order."""
+        """Implements PUT /order.
+
+        If a new clOrdID is given the amend is safe to retry: after a timeout
+        the order is looked up by it before the request is sent again.
+        """
 
         body = {}
 
@@ -265,7 +312,11 @@ class BitmexHTTP:
         if text is not None:
             body['text'] = text
 
-        return await self._make_request('/order', 'PUT', json_body=body, max_retries=0)
+        if clordid is not None:
+            return await self._submit_order(clordid, 'PUT', body)
+
+        request = self._make_request('/order', 'PUT', json_body=body, max_retries=0)
+        return await self._track_order('amend', origclordid or order_id, request)
 
     async def post_order(
             self,
@@ -283,12 +334,17 @@ class BitmexHTTP:
             exec_inst: Optional[str] = None,
             text: Optional[str] = None
     ) -> dict:
-        """Implements POST /order."""
+        """Implements POST /order.
+
+        A clOrdID is generated if none is given, so the submission is safe to retry.
+        """
 
         body = {}
 
         if symbol is None:
             symbol = self.symbol
+        if clordid is None:
+            clordid = self.generate_clordid()
 
         body['symbol'] = symbol
 
@@ -302,8 +358,8 @@ class BitmexHTTP:
             body['displayQty'] = display_qty
         if stop_px is not None:
             body['stopPx'] = stop_px
-        if clordid is not None:
-            body['clOrdID'] = clordid
+        body['clOrdID'] = clordid
+
         if peg_offset_value is not None:
             body['pegOffsetValue'] = peg_offset_value
         if peg_price_type is not None:
@@ -317,7 +373,7 @@ class BitmexHTTP:
         if text is not None:
             body['text'] = text
 
-        return await self._make_request('/order', 'POST', json_body=body, max_retries=0)
+        return await self._submit_order(clordid, 'POST', body)
 
     async def cancel_order(
             self,
@@ -336,7 +392,8 @@ class BitmexHTTP:
         if text is not None:
             body['text'] = text
 
-        return await self._make_request('/order', 'DELETE', max_retries=3)
+        request = self._make_request('/order', 'DELETE', json_body=body, max_retries=3)
+        return await self._track_order('cancel', clordid or order_id, request)
 
     async def cancel_all_orders(self) -> List[dict]:
         """Implements DELETE /order/all."""
@@ -496,8 +553,11 @@ class BitmexHTTP:
     async def logout(self) -> Union[List[dict], dict]:
         raise NotImplemented
 
-    async def get_margin(self) -> Union[List[dict], dict]:
-        raise NotImplemented
+    async def get_margin(self, currency: str = 'XBt') -> Union[List[dict], dict]:
+        """Implements GET /user/margin."""
+
+        params = {'currency': currency}
+        return await self._make_request(path='/user/margin', verb='GET', query=params)
 
     async def get_min_withdrawal_fee(self) -> Union[List[dict], dict]:
         raise NotImplemented
@@ -514,8 +574,11 @@ class BitmexHTTP:
     async def request_withdrawal(self) -> Union[List[dict], dict]:
         raise NotImplemented
 
-    async def get_wallet(self) -> Union[List[dict], dict]:
-        raise NotImplemented
+    async def get_wallet(self, currency: str = 'XBt') -> Union[List[dict], dict]:
+        """Implements GET /user/wallet."""
+
+        params = {'currency': currency}
+        return await self._make_request(path='/user/wallet', verb='GET', query=params)
 
     async def get_wallet_history(self) -> Union[List[dict], dict]:
         raise NotImplemented
@@ -532,6 +595,113 @@ class BitmexHTTP:
 
     # END ENDPOINTS #
 
+    async def _submit_order(self, clordid: str, verb: str, body: dict, max_retries: int = 3) -> dict:
+        """Send an order request identified by clOrdID.
+
+        Concurrent submissions with the same clOrdID share one request.
+        After a timeout or a connection error the order is looked up by clOrdID,
+        the request is sent again only if the exchange has not seen it.
+        """
+
+        inflight = self.inflight_orders.get(clordid)
+        if inflight is None:
+            inflight = asyncio.ensure_future(self._send_order(clordid, verb, body, max_retries))
+            self.inflight_orders[clordid] = inflight
+            inflight.add_done_callback(lambda _: self.inflight_orders.pop(clordid, None))
+
+        # Cancelling one of the callers must not cancel the request for the others
+        return await asyncio.shield(inflight)
+
+    async def _track_order(
+            self,
+            action: str,
+            key: Optional[str],
+            request: Awaitable
+    ) -> Union[List[dict], dict]:
+        """Await an order request, stamping it in the order tracker if there is one."""
+
+        if self.order_tracker is None or key is None:
+            return await request
+
+        self.order_tracker.on_submit(key, action)
+        try:
+            response = await request
+        except BaseException:
+            self.order_tracker.on_error(key)
+            raise
+        self.order_tracker.on_response(key, response)
+
+        return response
+
+    async def _send_order(self, clordid: str, verb: str, body: dict, max_retries: int) -> dict:
+        try:
+            order, reconciled = await self._send_order_attempts(clordid, verb, body, max_retries)
+        except BaseException:
+            if self.order_tracker is not None:
+                self.order_tracker.on_error(clordid)
+            raise
+
+        if self.order_tracker is not None:
+            self.order_tracker.on_response(clordid, order, reconciled=reconciled)
+
+        return order
+
+    async def _send_order_attempts(
+            self,
+            clordid: str,
+            verb: str,
+            body: dict,
+            max_retries: int
+    ) -> Tuple[dict, bool]:
+        """Returns the order and whether it was looked up rather than returned by the request."""
+
+        action = 'submit' if verb == 'POST' else 'amend'
+        attempt = 0
+        while True:
+            # Only the attempt that returns is timed, lookup backoffs are left out
+            if self.order_tracker is not None:
+                self.order_tracker.on_submit(clordid, action)
+            try:
+                return await self._make_request('/order', verb, json_body=body, max_retries=0), False
+            except aiohttp.ClientResponseError as e:
+                # The first request may land after the lookup found nothing,
+                # then the resent one is rejected as a duplicate clOrdID
+                if attempt == 0 or e.status != 400:
+                    raise
+                order = await self._find_order(clordid)
+                if order is None:
+                    raise
+                return order, True
+            except NETWORK_ERRORS:
+                # The exchange may have accepted the order before the connection failed,
+                # a failed lookup raises, the order is only resent when it is surely missing
+                order = await self._find_order(clordid)
+                if order is not None:
+                    return order, True
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+
+    async def _find_order(self, clordid: str, max_retries: int = 3) -> Optional[dict]:
+        """Look up an order by clOrdID, returns None if the exchange has no such order.
+
+        Waits with backoff before every attempt, so a request still queued at the
+        exchange has time to land. Raises the network error if all lookups fail.
+        """
+
+        query = {'filter': json.dumps({'clOrdID': clordid}), 'count': 1, 'reverse': 'true'}
+        attempt = 0
+        while True:
+            await asyncio.sleep(LOOKUP_BACKOFF * 2 ** attempt)
+            try:
+                orders = await self._make_request('/order', 'GET', query=query, max_retries=0)
+            except NETWORK_ERRORS:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+            else:
+                return orders[0] if orders else None
+
     async def _make_request(
             self,
             path: str,
@@ -542,6 +712,124 @@ class BitmexHTTP:
             max_retries=None
     ) -> Union[List[dict], dict]:
 
+        if self.hedge_requests and verb == 'GET':
+            return await self._hedged_request(path, query, timeout, max_retries)
+
+        return await self._send_request(path, verb, query, json_body, timeout, max_retries)
+
+    async def _hedged_request(
+            self,
+            path: str,
+            query: str = None,
+            timeout: int = None,
+            max_retries=None
+    ) -> Union[List[dict], dict]:
+        """Send a GET request and a duplicate of it if the response is late, the first response wins.
+
+        The hedge timer only runs while the first request is on the wire, waits for a rate limit
+        token and sleeps before retries are left out. Latency is recorded from the send of its
+        last attempt, as for unhedged requests, rather than for the winner, so the window keeps
+        the slow responses that hedging cuts off.
+        """
+
+        attempt = {'started': None}
+        on_wire = asyncio.Event()
+
+        def on_attempt(started: Optional[float]) -> None:
+            if started is None:
+                on_wire.clear()
+            else:
+                attempt['started'] = started
+                on_wire.set()
+
+        request = functools.partial(
+            self._send_request, path, 'GET', query, None, timeout, max_retries, record_latency=False
+        )
+        first = asyncio.ensure_future(request(on_attempt=on_attempt))
+        tasks = [first]
+
+        try:
+            delay = self._hedge_delay('GET', path)
+            while delay is not None and not first.done():
+                if not on_wire.is_set():
+                    wire = asyncio.ensure_future(on_wire.wait())
+                    await asyncio.wait([first, wire], return_when=asyncio.FIRST_COMPLETED)
+                    wire.cancel()
+                    continue
+
+                remaining = attempt['started'] + delay - time.monotonic()
+                if remaining > 0:
+                    # Check again after the delay, the first request may have been retried meanwhile
+                    await asyncio.wait([first], timeout=remaining)
+                    continue
+
+                # A hedge must not queue for a token while the key is throttled
+                rate_limited = self.rate_limiter is not None and not self.rate_limiter.available()
+                if not rate_limited and self._reserve_hedge():
+                    # The first request holds its connection, the duplicate goes over another one
+                    tasks.append(asyncio.ensure_future(request()))
+                break
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if attempt['started'] is not None:
+                            self._record_latency('GET', path, time.monotonic() - attempt['started'])
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_delay(self, verb: str, path: str) -> Optional[float]:
+        """Time to wait for a response before hedging, None if there are too few samples yet."""
+
+        window = self.latencies.get(verb + ' ' + path)
+        if window is None or len(window) < HEDGE_MIN_SAMPLES:
+            return None
+
+        return window.quantile(self.hedge_quantile)
+
+    def _record_latency(self, verb: str, path: str, seconds: float) -> None:
+        key = verb + ' ' + path
+        if key not in self.latencies:
+            self.latencies[key] = RollingWindow()
+        self.latencies[key].add(seconds)
+
+    def _reserve_hedge(self) -> bool:
+        """Account a hedge in the last minute of rate limit, returns False if the budget is spent."""
+
+        now = time.monotonic()
+        while self.hedge_times and now - self.hedge_times[0] > 60:
+            self.hedge_times.popleft()
+
+        if len(self.hedge_times) + 1 > self.hedge_budget * self.ratelimit_limit:
+            return False
+
+        self.hedge_times.append(now)
+        return True
+
+    async def _send_request(
+            self,
+            path: str,
+            verb: str,
+            query: str = None,
+            json_body: dict = None,
+            timeout: int = None,
+            max_retries=None,
+            record_latency: bool = True,
+            on_attempt: Optional[Callable[[Optional[float]], None]] = None
+    ) -> Union[List[dict], dict]:
+        """Make a request, retrying it on errors BitMEX recovers from.
+
+        on_attempt is called with the time an attempt is sent and with None once its response arrives.
+        """
+
         # TODO: join url parts more safely and properly
         url = self.base_url + path
 
@@ -555,13 +843,21 @@ class BitmexHTTP:
             self.retries += 1
             if self.retries > max_retries:
                 raise Exception('Max retries on {} hit, raising.'.format(path, data))
-            return await self._make_request(path, query, json_body, timeout, verb, max_retries)
+            return await self._send_request(
+                path, verb, query, json_body, timeout, max_retries, record_latency, on_attempt
+            )
+
+        if self.rate_limiter is not None:
+            await self.rate_limiter.acquire()
 
         # Auth
         data = json.dumps(json_body) if json_body is not None else ''
         headers = generate_auth_headers(self.api_key, self.api_secret, verb, url, data)
 
         # Make the request
+        started = time.monotonic()
+        if on_attempt is not None:
+            on_attempt(started)
         async with self.session.request(
             method=verb,
             url=url,
@@ -570,6 +866,9 @@ class BitmexHTTP:
             json=json_body,
             timeout=timeout
         ) as response:
+            if on_attempt is not None:
+                on_attempt(None)
+
             try:
                 # Throw non-200 errors
                 response.raise_for_status()
@@ -617,4 +916,12 @@ class BitmexHTTP:
 
             self.retries = 0
 
-            return await response.json()
+            result = await response.json()
+
+            if 'X-RateLimit-Limit' in response.headers:
+                self.ratelimit_limit = int(response.headers['X-RateLimit-Limit'])
+
+            if record_latency:
+                self._record_latency(verb, path, time.monotonic() - started)
+
+            return result
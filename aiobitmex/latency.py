@@ -0,0 +1,187 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Union
+
+from aiobitmex.stats import RollingWindow
+from aiobitmex.ws import timestamp_ms
+
+# Order statuses after which no more events are expected
+FINAL_STATUSES = ('Filled', 'Canceled', 'Rejected')
+
+
+class OrderLatencyTracker:
+    """Measures order lifecycle latencies, orders are keyed by clOrdID.
+
+    Submissions are stamped and correlated with the REST response and with `order`
+    and `execution` websocket events, whose `transactTime` and `timestamp` fields
+    give the time on the exchange. Rolling windows, in seconds:
+
+    submit, amend, cancel - request sent -> REST response received
+    submit_exchange, amend_exchange, cancel_exchange - request sent -> processed by the matching engine
+    submit_ws, amend_ws, cancel_ws - request sent -> first websocket `order` event received
+    exchange_ack - processed by the matching engine -> REST response received
+    ack_fill - accepted by the matching engine -> first fill, both on the exchange clock
+    fill_ws - fill on the exchange -> websocket `execution` event received
+
+    Intervals between local events use the monotonic clock. Latencies that mix
+    the local wall clock and the exchange clock include the clock offset.
+    """
+
+    def __init__(self, window_size: int = 1000, max_orders: int = 10000) -> None:
+        self.window_size = window_size
+        self.max_orders = max_orders
+        self.windows: Dict[str, RollingWindow] = {}
+        # State of orders in flight by clOrdID and by orderID, once it is known
+        self.orders = {}
+        # The same states by the key they were submitted with, oldest first
+        self.states = OrderedDict()
+
+    def _record(self, name: str, seconds: float) -> None:
+        if name not in self.windows:
+            self.windows[name] = RollingWindow(self.window_size)
+        self.windows[name].add(seconds)
+
+    def _find(self, item: dict) -> Optional[dict]:
+        for key in (item.get('clOrdID'), item.get('orderID')):
+            if key and key in self.orders:
+                return self.orders[key]
+        return None
+
+    def _forget(self, state: dict) -> None:
+        for key in state['keys']:
+            self.orders.pop(key, None)
+        self.states.pop(state['keys'][0], None)
+
+    def _complete(self, state: dict) -> None:
+        """Forget an order once both its REST response and its final websocket event are seen.
+
+        The websocket event often comes first, for marketable orders and cancels especially.
+        """
+
+        if state['responded'] and state['final']:
+            self._forget(state)
+
+    def on_submit(self, key: str, action: str = 'submit') -> None:
+        """Stamp an order request, action is one of submit, amend or cancel."""
+
+        state = self.orders.get(key)
+        if state is None:
+            state = {'keys': [key], 'acked': None, 'filled': False, 'final': False}
+            self.orders[key] = state
+            self.states[key] = state
+        else:
+            self.states.move_to_end(state['keys'][0])
+
+        state.update({
+            'action': action,
+            'sent': time.time(),
+            'sent_monotonic': time.monotonic(),
+            'ws_acked': False,
+            'responded': False
+        })
+
+        while len(self.states) > self.max_orders:
+            self._forget(next(iter(self.states.values())))
+
+    def on_response(
+            self,
+            key: str,
+            response: Union[List[dict], dict],
+            reconciled: bool = False
+    ) -> None:
+        """Correlate the REST response of a stamped request.
+
+        A reconciled response is an order looked up after the request failed, it does not
+        tell when the request was processed, so no latency is recorded from it.
+        """
+
+        received = time.time()
+        received_monotonic = time.monotonic()
+        state = self.orders.get(key)
+        if state is None:
+            return
+
+        if isinstance(response, list):
+            response = response[0] if response else {}
+
+        state['responded'] = True
+
+        if not reconciled:
+            self._record(state['action'], received_monotonic - state['sent_monotonic'])
+
+            transacted = response.get('transactTime') or response.get('timestamp')
+            if transacted is not None:
+                transacted = timestamp_ms(transacted) / 1000
+                self._record(state['action'] + '_exchange', transacted - state['sent'])
+                self._record('exchange_ack', received - transacted)
+                if state['acked'] is None:
+                    state['acked'] = transacted
+
+        # Let websocket events find the order by orderID too
+        order_id = response.get('orderID')
+        if order_id and order_id not in self.orders:
+            state['keys'].append(order_id)
+            self.orders[order_id] = state
+
+        self._complete(state)
+
+    def on_error(self, key: str) -> None:
+        """Handle a stamped request that raised instead of returning a response.
+
+        A failed submission is forgotten. After a failed amend or cancel the order
+        is still tracked until its final websocket event.
+        """
+
+        state = self.orders.get(key)
+        if state is None:
+            return
+
+        if state['action'] == 'submit':
+            self._forget(state)
+        else:
+            state['responded'] = True
+            self._complete(state)
+
+    def on_order(self, order: dict) -> None:
+        """Correlate an item of the `order` websocket table."""
+
+        received_monotonic = time.monotonic()
+        state = self._find(order)
+        if state is None:
+            return
+
+        if not state['ws_acked']:
+            state['ws_acked'] = True
+            self._record(state['action'] + '_ws', received_monotonic - state['sent_monotonic'])
+
+        if state['acked'] is None and order.get('transactTime'):
+            state['acked'] = timestamp_ms(order['transactTime']) / 1000
+
+        # A fill is final after its execution event, which may come after the order update
+        if order.get('ordStatus') in ('Canceled', 'Rejected'):
+            state['final'] = True
+            self._complete(state)
+
+    def on_execution(self, execution: dict) -> None:
+        """Correlate an item of the `execution` websocket table."""
+
+        received = time.time()
+        state = self._find(execution)
+        if state is None:
+            return
+
+        if execution.get('execType') == 'Trade' and not state['filled']:
+            state['filled'] = True
+            filled = timestamp_ms(execution['transactTime']) / 1000
+            if state['acked'] is not None:
+                self._record('ack_fill', filled - state['acked'])
+            self._record('fill_ws', received - filled)
+
+        if execution.get('ordStatus') in FINAL_STATUSES:
+            state['final'] = True
+            self._complete(state)
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, percentiles and maximum of every tracked latency."""
+
+        return {name: window.summary() for name, window in self.windows.items()}
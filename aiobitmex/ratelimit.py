@@ -0,0 +1,39 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """Token bucket limiting the requests made with one API key."""
+
+    def __init__(self, requests_per_minute: int = 120, burst: Optional[int] = None) -> None:
+        if requests_per_minute < 1:
+            raise ValueError('Requests per minute must be a positive integer.')
+        if burst is not None and burst < 1:
+            raise ValueError('Burst must be a positive integer.')
+
+        self.rate = requests_per_minute / 60
+        self.capacity = burst if burst is not None else requests_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def available(self) -> bool:
+        """Whether a request may be sent right away."""
+
+        self._refill()
+        return self.tokens >= 1
+
+    async def acquire(self) -> None:
+        """Wait until a request may be sent."""
+
+        self._refill()
+        while self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self._refill()
+
+        self.tokens -= 1
@@ -0,0 +1,41 @@
+from collections import deque
+
+
+class RollingWindow:
+    """Keeps the last samples of a measurement and answers quantile queries over them."""
+
+    def __init__(self, size: int = 200) -> None:
+        if size < 1:
+            raise ValueError('Window size must be a positive integer.')
+        self.samples = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not 0 <= q <= 1:
+            raise ValueError('Quantile must be between 0 and 1.')
+        if not self.samples:
+            raise ValueError('Window is empty.')
+
+        ordered = sorted(self.samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def summary(self) -> dict:
+        """Count, percentiles and maximum of the samples in the window."""
+
+        if not self.samples:
+            return {'count': 0}
+
+        ordered = sorted(self.samples)
+        last = len(ordered) - 1
+        return {
+            'count': len(ordered),
+            'p50': ordered[min(int(0.5 * len(ordered)), last)],
+            'p95': ordered[min(int(0.95 * len(ordered)), last)],
+            'p99': ordered[min(int(0.99 * len(ordered)), last)],
+            'max': ordered[last],
+        }
@@ -0,0 +1,8 @@
+import datetime
+
+
+def timestamp_ms(timestamp: str) -> int:
+    """Convert a BitMEX ISO timestamp to milliseconds since the epoch."""
+
+    parsed = datetime.datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
+    return int(parsed.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
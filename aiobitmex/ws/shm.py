@@ -0,0 +1,315 @@
+import struct
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Tuple
+
+from aiobitmex.ws import timestamp_ms
+
+# Number of records ever published into the ring
+_HEAD = struct.Struct('<Q')
+# Head, capacity and record size, the layout is checked by readers on attach
+_HEADER = struct.Struct('<QQQ')
+# Per-slot seqlock version: odd while the slot is being written
+_VERSION = struct.Struct('<Q')
+
+# timestamp (ms), price, size, side (1 - Buy, -1 - Sell)
+TRADE_FORMAT = '<qdqb'
+
+SIDES = {'Buy': 1, 'Sell': -1}
+
+# Seconds a slot may stay half written before the writer is considered dead,
+# well above the time a healthy writer can be preempted for on a busy machine
+STALL_TIMEOUT = 1.0
+
+
+class RingOverrun(Exception):
+    """Raised when a reader asks for a record the writer has already overwritten."""
+
+
+class RingStalled(Exception):
+    """Raised when a slot stays half written, the writer has probably died in the middle of a write."""
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing segment without registering it in the resource tracker.
+
+    Otherwise the tracker of a reader process unlinks the segment the writer owns
+    when the reader exits (Python < 3.13).
+    """
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+
+    # Not thread-safe, attach readers before starting threads that create shared memory
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class SharedRing:
+    """Fixed-size ring buffer of structs living in shared memory.
+
+    A single writer process publishes records, any number of reader processes
+    attach to the ring by name and unpack records straight from the shared buffer,
+    without pickling. Every slot is guarded by a seqlock: the writer makes the slot
+    version odd before writing and even after, readers retry on a torn read
+    and detect when they have been lapped by the writer.
+
+    Requires Python 3.8+ (multiprocessing.shared_memory).
+    """
+
+    def __init__(self, name: str, record_format: str, capacity: int, create: bool = False) -> None:
+        if capacity < 1:
+            raise ValueError('Capacity must be a positive integer.')
+
+        self.name = name
+        self.record = struct.Struct(record_format)
+        self.capacity = capacity
+        self.slot_size = _VERSION.size + self.record.size
+        self.owner = create
+
+        size = _HEADER.size + capacity * self.slot_size
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach(name)
+
+        if create:
+            self.shm.buf[:size] = bytes(size)
+            _HEADER.pack_into(self.shm.buf, 0, 0, capacity, self.record.size)
+        else:
+            # shm.size is rounded up to pages, so the layout is checked against the header
+            _, ring_capacity, record_size = _HEADER.unpack_from(self.shm.buf, 0)
+            if (ring_capacity, record_size) != (capacity, self.record.size):
+                self.shm.close()
+                raise ValueError(
+                    'Ring {} holds {} records of {} bytes, not {} records of {} bytes.'.format(
+                        name, ring_capacity, record_size, capacity, self.record.size
+                    )
+                )
+
+        self._head = _HEAD.unpack_from(self.shm.buf, 0)[0]
+
+    @property
+    def head(self) -> int:
+        """Index of the next record to be published."""
+
+        return _HEAD.unpack_from(self.shm.buf, 0)[0]
+
+    def _offset(self, index: int) -> int:
+        return _HEADER.size + (index % self.capacity) * self.slot_size
+
+    def publish(self, *values) -> int:
+        """Write a record into the ring, returns its index. Writer side only."""
+
+        index = self._head
+        offset = self._offset(index)
+        buf = self.shm.buf
+
+        _VERSION.pack_into(buf, offset, 2 * index + 1)
+        self.record.pack_into(buf, offset + _VERSION.size, *values)
+        _VERSION.pack_into(buf, offset, 2 * index + 2)
+
+        self._head = index + 1
+        _HEAD.pack_into(buf, 0, self._head)
+
+        return index
+
+    def read(self, index: int) -> Optional[tuple]:
+        """Read a record by index, returns None if it is not published yet.
+
+        Raises RingStalled if the slot stays half written for STALL_TIMEOUT seconds.
+        """
+
+        offset = self._offset(index)
+        buf = self.shm.buf
+        expected = 2 * index + 2
+        deadline = None
+
+        while True:
+            version = _VERSION.unpack_from(buf, offset)[0]
+            if version == expected:
+                values = self.record.unpack_from(buf, offset + _VERSION.size)
+                if _VERSION.unpack_from(buf, offset)[0] == version:
+                    return values
+            elif version > expected:
+                raise RingOverrun('Record {} of {} was overwritten.'.format(index, self.name))
+            elif version < expected - 1:
+                return None
+
+            # The slot is being written right now or the read was torn, try again
+            if deadline is None:
+                deadline = time.monotonic() + STALL_TIMEOUT
+            elif time.monotonic() > deadline:
+                raise RingStalled('Record {} of {} is still being written.'.format(index, self.name))
+
+    def read_since(self, cursor: int) -> Tuple[List[tuple], int]:
+        """Read all records published since cursor, returns them and the next cursor.
+
+        A reader that has fallen behind by more than the ring capacity
+        skips forward to the oldest record still available. Reading stops
+        at a slot that stays half written, the next call starts from it.
+        """
+
+        records = []
+        head = self.head
+        cursor = max(cursor, head - self.capacity)
+
+        while cursor < head:
+            try:
+                record = self.read(cursor)
+            except RingOverrun:
+                cursor = max(cursor + 1, self.head - self.capacity)
+                continue
+            except RingStalled:
+                break
+            if record is None:
+                break
+            records.append(record)
+            cursor += 1
+
+        return records, cursor
+
+    def close(self) -> None:
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def book_format(depth: int) -> str:
+    """Struct format of an order book snapshot: timestamp and (price, size) levels per side."""
+
+    return '<q' + 'dq' * 2 * depth
+
+
+def ring_name(name: str, symbol: str, table: str) -> str:
+    return '{}-{}-{}'.format(name, symbol, table)
+
+
+class MarketDataPublisher:
+    """Publishes trades and order book snapshots received by the websocket owner process.
+
+    Every symbol gets its own pair of rings, so one publisher can carry a multi-instrument feed.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            symbols: List[str],
+            depth: int = 10,
+            trade_capacity: int = 65536,
+            book_capacity: int = 4096
+    ) -> None:
+
+        self.depth = depth
+        self.trades = {}
+        self.books = {}
+        try:
+            for symbol in symbols:
+                self.trades[symbol] = SharedRing(
+                    ring_name(name, symbol, 'trade'), TRADE_FORMAT, trade_capacity, create=True
+                )
+                self.books[symbol] = SharedRing(
+                    ring_name(name, symbol, 'book'), book_format(depth), book_capacity, create=True
+                )
+        except Exception:
+            self.close()
+            raise
+
+    def _ring(self, rings: dict, symbol: str) -> SharedRing:
+        if symbol not in rings:
+            raise ValueError('Symbol {} is not published.'.format(symbol))
+        return rings[symbol]
+
+    def publish_trade(self, trade: dict) -> int:
+        """Publish an item of the `trade` table."""
+
+        return self._ring(self.trades, trade['symbol']).publish(
+            timestamp_ms(trade['timestamp']),
+            trade['price'],
+            trade['size'],
+            SIDES[trade['side']]
+        )
+
+    def publish_book(self, book: dict) -> int:
+        """Publish an item of the `orderBook10` table, missing levels are zero filled."""
+
+        values = [timestamp_ms(book['timestamp'])]
+        for levels in (book['bids'], book['asks']):
+            for i in range(self.depth):
+                if i < len(levels):
+                    values.extend((levels[i][0], levels[i][1]))
+                else:
+                    values.extend((0.0, 0))
+
+        return self._ring(self.books, book['symbol']).publish(*values)
+
+    def close(self) -> None:
+        for ring in list(self.trades.values()) + list(self.books.values()):
+            ring.close()
+
+
+class MarketDataSubscriber:
+    """Reads trades and order book snapshots of one symbol published by a MarketDataPublisher."""
+
+    def __init__(
+            self,
+            name: str,
+            symbol: str,
+            depth: int = 10,
+            trade_capacity: int = 65536,
+            book_capacity: int = 4096
+    ) -> None:
+
+        self.depth = depth
+        self.trades = SharedRing(ring_name(name, symbol, 'trade'), TRADE_FORMAT, trade_capacity)
+        try:
+            self.book = SharedRing(ring_name(name, symbol, 'book'), book_format(depth), book_capacity)
+        except Exception:
+            self.trades.close()
+            raise
+        # Start from the current position, history is not replayed
+        self.trade_cursor = self.trades.head
+
+    def poll_trades(self) -> List[tuple]:
+        """Return trades published since the last poll as (timestamp, price, size, side) tuples."""
+
+        trades, self.trade_cursor = self.trades.read_since(self.trade_cursor)
+        return trades
+
+    def latest_book(self) -> Optional[dict]:
+        """Return the latest order book snapshot or None if nothing was published yet.
+
+        Raises RingStalled if no complete snapshot can be read for STALL_TIMEOUT seconds.
+        """
+
+        deadline = time.monotonic() + STALL_TIMEOUT
+        while True:
+            head = self.book.head
+            if head == 0:
+                return None
+            try:
+                values = self.book.read(head - 1)
+            except RingOverrun:
+                # The writer lapped the ring under us, read the new head
+                if time.monotonic() > deadline:
+                    raise RingStalled('No complete snapshot in {}.'.format(self.book.name))
+                continue
+            if values is not None:
+                break
+
+        bids = values[1:1 + 2 * self.depth]
+        asks = values[1 + 2 * self.depth:]
+        return {
+            'timestamp': values[0],
+            'bids': [list(bids[i:i + 2]) for i in range(0, len(bids), 2) if bids[i + 1]],
+            'asks': [list(asks[i:i + 2]) for i in range(0, len(asks), 2) if asks[i + 1]],
+        }
+
+    def close(self) -> None:
+        self.trades.close()
+        self.book.close()
@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+import pytest
+
+from aiobitmex.fleet import BitmexFleet
+
+
+def make_fleet(size, **kwargs):
+    accounts = {'account{}'.format(i): ('key{}'.format(i), 'secret{}'.format(i)) for i in range(size)}
+    return BitmexFleet(base_url='http://localhost', accounts=accounts, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_fleet_runs_concurrently():
+    fleet = make_fleet(50)
+
+    async def cancel_all(conn):
+        await asyncio.sleep(0.1)
+        if conn.api_key == 'key7':
+            raise ValueError(conn.api_key)
+        return [{'account': conn.api_key}]
+
+    started = time.monotonic()
+    results = await fleet.run(cancel_all)
+
+    assert time.monotonic() - started < 0.5
+    assert len(results) == 50
+    assert results['account0'] == [{'account': 'key0'}]
+    assert isinstance(results['account7'], ValueError)
+    assert all(conn.session is fleet.session for conn in fleet.accounts.values())
+    await fleet.exit()
+
+
+@pytest.mark.asyncio
+async def test_fleet_bounded_parallelism():
+    fleet = make_fleet(6, max_concurrency=2)
+    active = []
+    peak = []
+
+    async def operation(conn):
+        active.append(conn)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(conn)
+
+    await fleet.run(operation, accounts=['account1', 'account2', 'account3', 'account4'])
+
+    assert max(peak) == 2
+    assert len(peak) == 4
+    await fleet.exit()
@@ -0,0 +1,166 @@
+import asyncio
+import time
+
+import pytest
+
+from aiobitmex.http import BitmexHTTP, HEDGE_MIN_SAMPLES
+from aiobitmex.ratelimit import RateLimiter
+from aiobitmex.stats import RollingWindow
+
+
+class SlowFirstRequest:
+    """Replaces BitmexHTTP._send_request, the first request is sent after `queued` seconds, hangs."""
+
+    def __init__(self, queued=0.0):
+        self.queued = queued
+        self.calls = 0
+        self.cancelled = 0
+        self.hedged_at = None
+
+    async def __call__(self, path, verb, query=None, json_body=None, timeout=None, max_retries=None,
+                       record_latency=True, on_attempt=None):
+        assert not record_latency
+        self.calls += 1
+        call = self.calls
+        try:
+            if call == 1:
+                # Waiting for a rate limit token or sleeping before a retry
+                await asyncio.sleep(self.queued)
+                on_attempt(time.monotonic())
+            else:
+                self.hedged_at = time.monotonic()
+            await asyncio.sleep(10 if call == 1 else 0.05)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return {'call': call}
+
+
+def make_conn(queued=0.0, **kwargs):
+    conn = BitmexHTTP(
+        base_url='http://localhost', api_key='key', api_secret='secret', hedge_requests=True, **kwargs
+    )
+    conn.latencies['GET /order'] = window = RollingWindow()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        window.add(0.01)
+    conn._send_request = SlowFirstRequest(queued)
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins():
+    conn = make_conn()
+
+    assert await conn._make_request('/order', 'GET') == {'call': 2}
+    # Let the loser handle its cancellation
+    await asyncio.sleep(0)
+    assert conn._send_request.cancelled == 1
+    assert len(conn.hedge_times) == 1
+    # The call took the hedge delay plus the hedge, not just the hedge
+    assert len(conn.latencies['GET /order']) == HEDGE_MIN_SAMPLES + 1
+    assert conn.latencies['GET /order'].samples[-1] >= 0.06
+    await conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_hedge_budget_spent():
+    conn = make_conn(hedge_budget=0)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(conn._make_request('/order', 'GET'), timeout=0.1)
+    assert conn._send_request.calls == 1
+    assert conn._send_request.cancelled == 1
+    await conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_hedge_timer_starts_when_first_request_is_sent():
+    conn = make_conn(queued=0.2)
+
+    started = time.monotonic()
+    assert await conn._make_request('/order', 'GET') == {'call': 2}
+
+    # The hedge fires after the delay counted from the send, not from the call
+    assert conn._send_request.hedged_at - started >= 0.2
+    # The time the first request was queued is not counted as latency
+    assert 0.06 <= conn.latencies['GET /order'].samples[-1] < 0.2
+    await conn.exit()
+
+
+class FakeResponse:
+    status = 200
+    headers = {}
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.latency)
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    async def json(self):
+        return {'latency': self.latency}
+
+
+class FakeSession:
+    """Replaces the aiohttp session, responses take the given latencies in turn."""
+
+    def __init__(self, *latencies):
+        self.latencies = list(latencies)
+        self.requests = 0
+
+    def request(self, **kwargs):
+        self.requests += 1
+        return FakeResponse(self.latencies.pop(0))
+
+
+async def make_limited_conn(limiter, *latencies):
+    conn = BitmexHTTP(
+        base_url='http://localhost', api_key='key', api_secret='secret', hedge_requests=True,
+        rate_limiter=limiter
+    )
+    await conn.session.close()
+    conn.session = FakeSession(*latencies)
+    conn.latencies['GET /order'] = window = RollingWindow()
+    for _ in range(HEDGE_MIN_SAMPLES):
+        window.add(0.01)
+    return conn
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_while_queued_for_token():
+    limiter = RateLimiter(requests_per_minute=600, burst=1)
+    await limiter.acquire()
+    conn = await make_limited_conn(limiter, 0.005)
+
+    # Waits ~0.1s for a token, much longer than the hedge delay, but is fast on the wire
+    assert await conn._make_request('/order', 'GET') == {'latency': 0.005}
+    assert conn.session.requests == 1
+    assert not conn.hedge_times
+    assert conn.latencies['GET /order'].samples[-1] < 0.05
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_free_token():
+    limiter = RateLimiter(requests_per_minute=60, burst=1)
+    conn = await make_limited_conn(limiter, 0.1)
+
+    assert await conn._make_request('/order', 'GET') == {'latency': 0.1}
+    assert conn.session.requests == 1
+    assert not conn.hedge_times
+
+
+@pytest.mark.asyncio
+async def test_hedge_with_free_token():
+    limiter = RateLimiter(requests_per_minute=60, burst=2)
+    conn = await make_limited_conn(limiter, 10, 0.01)
+
+    assert await conn._make_request('/order', 'GET') == {'latency': 0.01}
+    assert conn.session.requests == 2
+    assert limiter.tokens < 1
@@ -0,0 +1,127 @@
+import asyncio
+
+import aiohttp
+import pytest
+
+from aiobitmex.http import BitmexHTTP
+
+
+class FakeExchange:
+    """Replaces BitmexHTTP._make_request, the first order request times out.
+
+    The timed out order reaches the exchange before the timeout, never,
+    or only after the first lookup.
+    """
+
+    def __init__(self, accepted_before_timeout=True, lookup_failures=0, lands_after_lookup=False):
+        self.accepted_before_timeout = accepted_before_timeout
+        self.lookup_failures = lookup_failures
+        self.lands_after_lookup = lands_after_lookup
+        self.late_order = None
+        self.orders = []
+        self.posts = 0
+
+    async def __call__(self, path, verb, query=None, json_body=None, timeout=None, max_retries=None):
+        if verb == 'GET':
+            if self.lookup_failures:
+                self.lookup_failures -= 1
+                raise asyncio.TimeoutError
+            found = [order for order in self.orders if query['filter'].find(order['clOrdID']) != -1]
+            if self.late_order is not None:
+                self.orders.append(self.late_order)
+                self.late_order = None
+            return found
+
+        self.posts += 1
+        await asyncio.sleep(0.01)
+        if self.posts == 1:
+            if self.lands_after_lookup:
+                self.late_order = json_body
+            elif self.accepted_before_timeout:
+                self.orders.append(json_body)
+            raise asyncio.TimeoutError
+        if any(order['clOrdID'] == json_body['clOrdID'] for order in self.orders):
+            raise aiohttp.ClientResponseError(None, (), status=400, message='Duplicate clOrdID')
+        self.orders.append(json_body)
+        return json_body
+
+
+@pytest.fixture(autouse=True)
+def no_lookup_backoff(monkeypatch):
+    monkeypatch.setattr('aiobitmex.http.LOOKUP_BACKOFF', 0)
+
+
+def make_conn():
+    return BitmexHTTP(base_url='http://localhost', symbol='XBTUSD', api_key='key', api_secret='secret')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('accepted_before_timeout', [True, False])
+async def test_post_order_after_timeout(accepted_before_timeout):
+    http_conn = make_conn()
+    http_conn._make_request = exchange = FakeExchange(accepted_before_timeout)
+
+    order = await http_conn.post_order(side='Buy', order_qty=100, price=30000)
+
+    assert order['clOrdID'].startswith('aiobitmex')
+    assert len(exchange.orders) == 1
+    assert exchange.posts == (1 if accepted_before_timeout else 2)
+    assert not http_conn.inflight_orders
+    await http_conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicate_submissions():
+    http_conn = make_conn()
+    http_conn._make_request = exchange = FakeExchange(accepted_before_timeout=False)
+
+    orders = await asyncio.gather(
+        *[http_conn.post_order(side='Sell', order_qty=1, clordid='dup') for _ in range(3)]
+    )
+
+    assert orders[0] == orders[1] == orders[2]
+    assert exchange.posts == 2
+    assert len(exchange.orders) == 1
+    await http_conn.exit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('accepted_before_timeout', [True, False])
+async def test_lookup_failure_after_timeout(accepted_before_timeout):
+    http_conn = make_conn()
+    http_conn._make_request = exchange = FakeExchange(accepted_before_timeout, lookup_failures=1)
+
+    # The first lookup fails, it is retried instead of resending the order
+    order = await http_conn.post_order(side='Buy', order_qty=100, price=30000)
+
+    assert len(exchange.orders) == 1
+    assert exchange.posts == (1 if accepted_before_timeout else 2)
+    assert order['clOrdID'] == exchange.orders[0]['clOrdID']
+    await http_conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_lookup_keeps_failing_after_timeout():
+    http_conn = make_conn()
+    exchange = FakeExchange(accepted_before_timeout=False, lookup_failures=100)
+    http_conn._make_request = exchange
+
+    with pytest.raises(asyncio.TimeoutError):
+        await http_conn.post_order(side='Buy', order_qty=100, price=30000)
+
+    # The order is not resent when it is unknown whether the exchange has it
+    assert exchange.posts == 1
+    await http_conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_order_lands_after_lookup():
+    http_conn = make_conn()
+    http_conn._make_request = exchange = FakeExchange(lands_after_lookup=True)
+
+    # The resent order is rejected as a duplicate, the order on the exchange is returned
+    order = await http_conn.post_order(side='Buy', order_qty=100, price=30000)
+
+    assert exchange.posts == 2
+    assert exchange.orders == [order]
+    await http_conn.exit()
@@ -0,0 +1,25 @@
+import pytest
+
+from aiobitmex.clordid import ClOrdIDGenerator, to_base36
+
+
+@pytest.mark.parametrize(
+    'number, expected', [(0, '0'), (35, 'z'), (36, '10'), (1295, 'zz')]
+)
+def test_to_base36(number, expected):
+    assert to_base36(number) == expected
+
+
+def test_generate_clordid():
+    generate = ClOrdIDGenerator('aiobitmex')
+    ids = [generate() for _ in range(1000)]
+
+    assert len(set(ids)) == len(ids)
+    assert all(clordid.startswith('aiobitmex' + generate.session) for clordid in ids)
+
+
+def test_generators_do_not_collide():
+    first, second = ClOrdIDGenerator('a' * 13), ClOrdIDGenerator('a' * 13)
+
+    assert first.session != second.session
+    assert len(first()) <= 36
@@ -0,0 +1,171 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+
+from aiobitmex.http import BitmexHTTP
+from aiobitmex.latency import OrderLatencyTracker
+
+LIFECYCLE = {'submit', 'submit_exchange', 'exchange_ack', 'submit_ws', 'ack_fill', 'fill_ws'}
+
+
+def iso(offset=0.0):
+    moment = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(seconds=offset)
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+
+
+def fill(**kwargs):
+    return dict(kwargs, execType='Trade', ordStatus='Filled', transactTime=iso())
+
+
+def make_conn(tracker):
+    return BitmexHTTP(
+        base_url='http://localhost', symbol='XBTUSD', api_key='key', api_secret='secret',
+        order_tracker=tracker
+    )
+
+
+def test_order_lifecycle():
+    tracker = OrderLatencyTracker()
+
+    tracker.on_submit('clordid1')
+    tracker.on_response('clordid1', {'orderID': 'order1', 'transactTime': iso(-1)})
+    tracker.on_order({'orderID': 'order1', 'ordStatus': 'New'})
+    tracker.on_execution(fill(orderID='order1'))
+
+    summary = tracker.summary()
+    assert set(summary) == LIFECYCLE
+    assert summary['ack_fill']['count'] == 1
+    assert 0.9 < summary['ack_fill']['p50'] < 1.1
+    assert not tracker.orders
+
+
+def test_cancel_forgets_order():
+    tracker = OrderLatencyTracker()
+
+    tracker.on_submit('clordid1')
+    tracker.on_response('clordid1', {'orderID': 'order1', 'timestamp': iso()})
+    tracker.on_submit('clordid1', 'cancel')
+    tracker.on_response('clordid1', [{'orderID': 'order1', 'ordStatus': 'Canceled'}])
+    tracker.on_order({'clOrdID': 'clordid1', 'ordStatus': 'Canceled'})
+
+    assert tracker.summary()['cancel']['count'] == 1
+    assert tracker.summary()['cancel_ws']['count'] == 1
+    assert not tracker.orders
+
+
+def test_websocket_events_before_response():
+    tracker = OrderLatencyTracker()
+
+    tracker.on_submit('clordid1')
+    tracker.on_order({'clOrdID': 'clordid1', 'ordStatus': 'New', 'transactTime': iso(-1)})
+    tracker.on_execution(fill(clOrdID='clordid1'))
+    assert tracker.orders
+
+    tracker.on_response('clordid1', {'orderID': 'order1', 'transactTime': iso(-1)})
+
+    assert set(tracker.summary()) == LIFECYCLE
+    assert not tracker.orders
+
+    tracker.on_submit('clordid2')
+    tracker.on_response('clordid2', {'orderID': 'order2', 'timestamp': iso()})
+    tracker.on_submit('clordid2', 'cancel')
+    tracker.on_order({'clOrdID': 'clordid2', 'ordStatus': 'Canceled'})
+    tracker.on_response('clordid2', [{'orderID': 'order2', 'ordStatus': 'Canceled'}])
+
+    assert tracker.summary()['cancel']['count'] == 1
+    assert tracker.summary()['cancel_ws']['count'] == 1
+    assert not tracker.orders
+
+
+def test_local_intervals_ignore_wall_clock_steps(monkeypatch):
+    tracker = OrderLatencyTracker()
+    tracker.on_submit('clordid1')
+
+    # NTP steps the wall clock an hour back
+    wall_clock = time.time() - 3600
+    monkeypatch.setattr(time, 'time', lambda: wall_clock)
+    tracker.on_response('clordid1', {'orderID': 'order1'})
+
+    assert 0 <= tracker.summary()['submit']['max'] < 1
+
+
+def test_max_orders():
+    tracker = OrderLatencyTracker(max_orders=2)
+    for i in range(3):
+        tracker.on_submit(str(i))
+        tracker.on_response(str(i), {'orderID': 'order' + str(i)})
+
+    # Aliases by orderID do not count as orders
+    assert list(tracker.states) == ['1', '2']
+    assert set(tracker.orders) == {'1', 'order1', '2', 'order2'}
+
+
+def test_failed_submission_is_forgotten():
+    tracker = OrderLatencyTracker()
+
+    tracker.on_submit('clordid1')
+    tracker.on_error('clordid1')
+
+    assert not tracker.orders
+    assert not tracker.states
+
+
+@pytest.mark.asyncio
+async def test_post_order_is_tracked():
+    tracker = OrderLatencyTracker()
+    conn = make_conn(tracker)
+
+    async def make_request(path, verb, query=None, json_body=None, timeout=None, max_retries=None):
+        return dict(json_body, orderID='order1', transactTime=iso())
+
+    conn._make_request = make_request
+    order = await conn.post_order(side='Buy', order_qty=1)
+
+    assert set(tracker.orders) == {order['clOrdID'], 'order1'}
+    assert tracker.summary()['submit']['count'] == 1
+    await conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_reconciled_order_is_not_timed(monkeypatch):
+    monkeypatch.setattr('aiobitmex.http.LOOKUP_BACKOFF', 0)
+    tracker = OrderLatencyTracker()
+    conn = make_conn(tracker)
+    orders = []
+
+    async def make_request(path, verb, query=None, json_body=None, timeout=None, max_retries=None):
+        if verb == 'GET':
+            # The order row carries the time of a later fill
+            return [dict(order, ordStatus='Filled', transactTime=iso(5)) for order in orders]
+        orders.append(dict(json_body, orderID='order1'))
+        raise asyncio.TimeoutError
+
+    conn._make_request = make_request
+    order = await conn.post_order(side='Buy', order_qty=1)
+
+    assert order['orderID'] == 'order1'
+    assert tracker.summary() == {}
+    assert set(tracker.orders) == {order['clOrdID'], 'order1'}
+    await conn.exit()
+
+
+@pytest.mark.asyncio
+async def test_failed_cancel_is_responded():
+    tracker = OrderLatencyTracker()
+    conn = make_conn(tracker)
+
+    async def make_request(path, verb, query=None, json_body=None, timeout=None, max_retries=None):
+        raise asyncio.TimeoutError
+
+    conn._make_request = make_request
+    tracker.on_submit('clordid1')
+    tracker.on_response('clordid1', {'orderID': 'order1'})
+
+    with pytest.raises(asyncio.TimeoutError):
+        await conn.cancel_order(clordid='clordid1')
+    tracker.on_order({'clOrdID': 'clordid1', 'ordStatus': 'Canceled'})
+
+    assert not tracker.orders
+    await conn.exit()
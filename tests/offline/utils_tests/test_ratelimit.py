@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from aiobitmex.ratelimit import RateLimiter
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_when_bucket_is_empty():
+    limiter = RateLimiter(requests_per_minute=600, burst=2)
+
+    started = time.monotonic()
+    for _ in range(3):
+        await limiter.acquire()
+
+    # The third request waits for a token, refilled at 10 per second
+    assert time.monotonic() - started >= 0.09
+
+
+@pytest.mark.parametrize(
+    'requests_per_minute, burst', [(0, None), (60, 0), (60, -1)]
+)
+def test_rate_limiter_wrong_rate(requests_per_minute, burst):
+    with pytest.raises(ValueError):
+        RateLimiter(requests_per_minute=requests_per_minute, burst=burst)
@@ -0,0 +1,24 @@
+import pytest
+
+from aiobitmex.stats import RollingWindow
+
+
+def test_rolling_window_quantile():
+    window = RollingWindow(size=100)
+    for value in range(200):
+        window.add(value)
+
+    assert len(window) == 100
+    assert window.quantile(0) == 100
+    assert window.quantile(0.95) == 195
+    assert window.quantile(1) == 199
+
+
+@pytest.mark.parametrize(
+    'q', [-0.1, 1.1]
+)
+def test_rolling_window_wrong_quantile(q):
+    window = RollingWindow()
+    window.add(1)
+    with pytest.raises(ValueError):
+        window.quantile(q)
@@ -0,0 +1,119 @@
+import multiprocessing
+import uuid
+
+import pytest
+
+from aiobitmex.ws.shm import (
+    SharedRing, RingOverrun, RingStalled, MarketDataPublisher, MarketDataSubscriber
+)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedRing('aiobitmex-test-' + uuid.uuid4().hex[:8], '<qd', 4, create=True)
+    yield ring
+    ring.close()
+
+
+def test_publish_and_read(ring):
+    reader = SharedRing(ring.name, '<qd', 4)
+    assert reader.read(0) is None
+
+    ring.publish(1, 1.5)
+    ring.publish(2, 2.5)
+
+    assert reader.head == 2
+    assert reader.read(1) == (2, 2.5)
+    assert reader.read_since(0) == ([(1, 1.5), (2, 2.5)], 2)
+    reader.close()
+
+
+@pytest.mark.parametrize(
+    'record_format, capacity', [('<qd', 8), ('<qq', 2), ('<qdq', 4)]
+)
+def test_attach_with_other_layout(ring, record_format, capacity):
+    with pytest.raises(ValueError):
+        SharedRing(ring.name, record_format, capacity)
+
+
+def test_overrun(ring):
+    for i in range(6):
+        ring.publish(i, float(i))
+
+    with pytest.raises(RingOverrun):
+        ring.read(0)
+    records, cursor = ring.read_since(0)
+    assert [record[0] for record in records] == [2, 3, 4, 5]
+    assert cursor == 6
+
+
+def test_writer_died_mid_write(ring, monkeypatch):
+    monkeypatch.setattr('aiobitmex.ws.shm.STALL_TIMEOUT', 0.01)
+
+    ring.publish(1, 1.5)
+    ring.publish(2, 2.5)
+    # Leave the second slot half written, as a writer killed inside publish() would
+    ring.shm.buf[ring._offset(1):ring._offset(1) + 8] = (3).to_bytes(8, 'little')
+
+    assert ring.read(0) == (1, 1.5)
+    with pytest.raises(RingStalled):
+        ring.read(1)
+    # Records before the stalled slot are returned, reading resumes from it
+    assert ring.read_since(0) == ([(1, 1.5)], 1)
+
+
+def trade(symbol, price, size, side):
+    return {
+        'symbol': symbol,
+        'timestamp': '2021-01-01T00:00:00.000Z',
+        'price': price,
+        'size': size,
+        'side': side
+    }
+
+
+def _consume(name, queue):
+    subscriber = MarketDataSubscriber(name, 'XBTUSD', depth=2)
+    queue.put(subscriber.latest_book())
+    subscriber.close()
+
+
+def test_market_data_across_processes():
+    name = 'aiobitmex-test-' + uuid.uuid4().hex[:8]
+    publisher = MarketDataPublisher(name, ['XBTUSD', 'ETHUSD'], depth=2)
+    subscriber = MarketDataSubscriber(name, 'XBTUSD', depth=2)
+
+    publisher.publish_trade(trade('XBTUSD', 29000.5, 100, 'Sell'))
+    publisher.publish_trade(trade('ETHUSD', 730.5, 5, 'Buy'))
+    publisher.publish_book({
+        'symbol': 'XBTUSD',
+        'timestamp': '2021-01-01T00:00:00.001Z',
+        'bids': [[29000.5, 10]],
+        'asks': [[29001, 20], [29001.5, 30]]
+    })
+
+    assert subscriber.poll_trades() == [(1609459200000, 29000.5, 100, -1)]
+    assert subscriber.poll_trades() == []
+
+    queue = multiprocessing.get_context('spawn').Queue()
+    process = multiprocessing.get_context('spawn').Process(target=_consume, args=(name, queue))
+    process.start()
+    book = queue.get(timeout=10)
+    process.join()
+
+    assert book == {
+        'timestamp': 1609459200001,
+        'bids': [[29000.5, 10]],
+        'asks': [[29001.0, 20], [29001.5, 30]]
+    }
+
+    subscriber.close()
+    publisher.close()
+
+
+def test_unknown_symbol():
+    publisher = MarketDataPublisher('aiobitmex-test-' + uuid.uuid4().hex[:8], ['XBTUSD'], depth=1)
+
+    with pytest.raises(ValueError):
+        publisher.publish_trade(trade('ETHUSD', 1, 1, 'Buy'))
+    publisher.close()